@@ -1,3 +1,4 @@
+import abc
 import os
 import sys
 import subprocess
@@ -7,7 +8,13 @@ import re
 import socket
 import logging
 import shutil
+import signal
 import glob
+import json
+import math
+import queue
+import threading
+import time
 
 from os import path
 from datetime import datetime, timezone
@@ -16,6 +23,13 @@ _CONSUMER_THRUPT_METRICS_NAMES = ['thrupt_msg/s', 'thrupt_Mbit/s']
 _PRODUCER_THRUPT_METRICS_NAMES = ['thrupt_msg/s', 'thrupt_Mbit/s', 'thrupt_failure_msg/s']
 _LATENCY_METRICS_NAMES = ['latency_mean', 'latency_med', 'latency_95pct', 'latency_99pct',
                           'latency_99.9pct', 'latency_99.99pct', 'latency_Max']
+_TARGET_RATE_METRICS_NAME = 'target_rate'
+_INTERVAL_RECORD_TYPE = 'interval'
+_DRAIN_RECORD_TYPE = 'drain'
+# Seeding rate (msg/s) when none is configured; high enough to never throttle the seeding producer
+_SEED_DEFAULT_RATE = 10000000
+_DRAIN_METRICS_NAMES = ['drain_init_backlog_msg', 'drain_msg', 'drain_time_s', 'drain_thrupt_msg/s',
+                        'drain_complete']
 
 _DT_FMT = "%Y-%m-%d"
 _TM_FMT = "%H:%M:%S"
@@ -28,6 +42,19 @@ _INVALID_GRAPHITE_CHARS = re.compile(r"[^a-zA-Z0-9_-]")
 
 _PULSAR_CMD_OUTPUT_SEPERATOR = "-------------------------------"
 
+# pulsar-perf log lines showing that the producers/consumers are created and the load starts
+_PPERF_CLIENTS_READY = re.compile(r"Created \d+ producers|Start receiving from \d+ consumers")
+# Max. time allowed for pulsar-perf to start its clients, on top of a load schedule step duration
+_PPERF_STARTUP_GRACE_SECONDS = 60
+
+# Max. UDP payload size that avoids IP fragmentation on a standard 1500 bytes MTU
+_UDP_MAX_PACKET_SIZE = 1432
+# Metrics exporter limits: socket operation timeout, max. wait for a sink to flush at exit,
+#   and max. number of records queued per sink (extra records are dropped and counted)
+_EXPORTER_SOCKET_TIMEOUT_SECONDS = 5
+_EXPORTER_STOP_TIMEOUT_SECONDS = 10
+_EXPORTER_QUEUE_SIZE = 10000
+
 
 ##
 # Error exit helper function
@@ -75,6 +102,13 @@ def _chk_graphite_port(portstr):
     return valid_port, error_msg
 
 
+##
+# Check whether a metrics exporter address is in format <host_ip_or_name>:<port_number>
+##
+def _chk_exporter_address(addrstr):
+    return re.match('^[\\w.-]+:[0-9]+$', addrstr) is not None
+
+
 ##
 # Generate "pulsar-perf" command option string from configuration setting dictionary
 ##
@@ -86,6 +120,92 @@ def _gen_pulsar_perf_cmdopt_str(settings):
     return cmd_optstr.rstrip()
 
 
+##
+# Convert a duration string (format: <integer_value>[h|m|s]) to seconds
+##
+def _parse_duration_str(duration_str):
+    duration_str = str(duration_str)
+    time_unit = duration_str[-1]
+    duration_intval = int(duration_str[0:len(duration_str) - 1])
+
+    if time_unit == 's':
+        return duration_intval
+    elif time_unit == 'm':
+        return duration_intval * 60
+    elif time_unit == 'h':
+        return duration_intval * 3600
+    else:
+        raise ValueError("Invalid duration unit: \"{}\"".format(time_unit))
+
+
+##
+# Convert a load schedule duration setting to seconds, which must be positive
+##
+def _parse_positive_duration_str(duration_str, setting_name):
+    duration_in_sec = _parse_duration_str(duration_str)
+    if duration_in_sec <= 0:
+        raise ValueError("\"{}\" must be positive: \"{}\"".format(setting_name, duration_str))
+    return duration_in_sec
+
+
+##
+# Expand the load schedule segments into a list of (target rate, duration in seconds) steps
+#   - step : a fixed "rate" for the segment "duration"
+#   - ramp : linear ramp from "start_rate" to "end_rate", changing rate every "step_duration"
+#   - burst: "burst_rate" for "burst_duration" at the start of every "period", "rate" otherwise
+##
+def _expand_load_schedule(segments):
+    sched_steps = []
+
+    for segment in segments:
+        segment_type = str(segment.get('type', '')).lower()
+        segment_duration = _parse_positive_duration_str(segment['duration'], "duration")
+
+        if segment_type == "step":
+            segment_steps = [(int(segment['rate']), segment_duration)]
+        elif segment_type == "ramp":
+            start_rate = int(segment['start_rate'])
+            end_rate = int(segment['end_rate'])
+            step_duration = _parse_positive_duration_str(segment.get('step_duration') or "30s", "step_duration")
+
+            step_cnt = math.ceil(segment_duration / step_duration)
+            segment_steps = []
+            for i in range(step_cnt):
+                rate = start_rate if step_cnt == 1 else \
+                    round(start_rate + (end_rate - start_rate) * i / (step_cnt - 1))
+                segment_steps.append((rate, min(step_duration, segment_duration - i * step_duration)))
+        elif segment_type == "burst":
+            base_rate = int(segment['rate'])
+            burst_rate = int(segment['burst_rate'])
+            burst_duration = _parse_positive_duration_str(segment['burst_duration'], "burst_duration")
+            period = _parse_positive_duration_str(segment['period'], "period")
+            if burst_duration >= period:
+                raise ValueError("\"burst_duration\" must be less than \"period\"")
+
+            segment_steps = []
+            remaining = segment_duration
+            while remaining > 0:
+                segment_steps.append((burst_rate, min(burst_duration, remaining)))
+                remaining = remaining - burst_duration
+                if remaining > 0:
+                    segment_steps.append((base_rate, min(period - burst_duration, remaining)))
+                    remaining = remaining - (period - burst_duration)
+        else:
+            raise ValueError("Invalid segment type: \"{}\". Valid values: [step, ramp, burst]".format(segment_type))
+
+        for rate, duration in segment_steps:
+            if rate <= 0 or duration <= 0:
+                raise ValueError("Segment rate and duration must be positive")
+
+            # merge adjacent steps with the same rate to avoid unnecessary pulsar-perf restarts
+            if sched_steps and sched_steps[-1][0] == rate:
+                sched_steps[-1] = (rate, sched_steps[-1][1] + duration)
+            else:
+                sched_steps.append((rate, duration))
+
+    return sched_steps
+
+
 ##
 # Get today's date and/or time string in default timezone
 ##
@@ -127,19 +247,373 @@ def _sanitize(s):
     return _INVALID_GRAPHITE_CHARS.sub('_', s)
 
 
+##
+# One parsed metrics record (e.g. one pulsar-perf interval line), handed over to every metrics sink
+##
+class MetricsRecord:
+    def __init__(self, rec_type, ts, clnt_type, m_names, m_values):
+        self.rec_type = rec_type
+        self.ts = ts
+        self.client_type = clnt_type
+        self.m_names = m_names
+        self.m_values = m_values
+
+
+##
+# Base metrics sink: receives records from the pipeline on its own (bounded) queue and writes
+#   them in batches from its own worker thread, so a slow sink never blocks line ingestion.
+#   A concrete sink implements "write_batch()" and optionally "open()" and "close_out()".
+##
+class MetricsSink(threading.Thread, abc.ABC):
+    def __init__(self, name, batch_size=100, flush_interval=1, rec_types=None):
+        threading.Thread.__init__(self, name=name, daemon=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rec_types = rec_types
+        # bounded, so that a stalled sink drops (and counts) records instead of growing without limit
+        self.queue = queue.Queue(maxsize=_EXPORTER_QUEUE_SIZE)
+        self.stop_event = threading.Event()
+        self.opened = False
+        self.dropped_cnt = 0
+        # records taken off the queue but not written yet
+        self.batch = []
+
+    def accepts(self, record):
+        return self.rec_types is None or record.rec_type in self.rec_types
+
+    def submit(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped_cnt = self.dropped_cnt + 1
+
+    def run(self):
+        try:
+            self.open()
+            self.opened = True
+        except Exception as ex:
+            logger_exporter.error("[{}] can't be opened ({}); metrics are dropped".format(self.name, repr(ex)))
+            self._close_out()
+            return
+
+        last_flush_time = time.monotonic()
+        while True:
+            # once stopping, only drain what is already queued
+            stopping = self.stop_event.is_set()
+            try:
+                if stopping:
+                    record = self.queue.get_nowait()
+                else:
+                    wait_time = max(0, self.flush_interval - (time.monotonic() - last_flush_time))
+                    record = self.queue.get(timeout=wait_time)
+
+                # "None" only wakes up the thread when stopping (see "request_stop()")
+                if record is not None:
+                    self.batch.append(record)
+            except queue.Empty:
+                if stopping:
+                    break
+
+            if self.batch and (len(self.batch) >= self.batch_size or
+                               time.monotonic() - last_flush_time >= self.flush_interval):
+                self._write_batch()
+
+            if not self.batch:
+                last_flush_time = time.monotonic()
+
+        if self.batch:
+            self._write_batch()
+        self._close_out()
+
+    def _write_batch(self):
+        try:
+            self.write_batch(self.batch)
+        except Exception as ex:
+            self.dropped_cnt = self.dropped_cnt + len(self.batch)
+            logger_exporter.error("[{}] failed to write {} metrics records ({})".format(
+                self.name, len(self.batch), repr(ex)))
+        self.batch = []
+
+    def _close_out(self):
+        try:
+            self.close_out()
+        except Exception as ex:
+            logger_exporter.error("[{}] can't be closed ({})".format(self.name, repr(ex)))
+
+    # Ask the thread to write what is queued and exit, without waiting for the flush interval
+    def request_stop(self):
+        self.stop_event.set()
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            # the thread has records to process, so it isn't waiting on the queue
+            pass
+
+    # Wait (bounded) for the queued records to be written; whatever is left is dropped
+    def stop(self):
+        self.request_stop()
+        self.join(_EXPORTER_STOP_TIMEOUT_SECONDS)
+
+        if self.is_alive() or not self.opened:
+            self.dropped_cnt = self.dropped_cnt + len(self.batch)
+            while True:
+                try:
+                    if self.queue.get_nowait() is not None:
+                        self.dropped_cnt = self.dropped_cnt + 1
+                except queue.Empty:
+                    break
+        if self.is_alive():
+            logger_exporter.warning("[{}] didn't finish writing within {} seconds".format(
+                self.name, _EXPORTER_STOP_TIMEOUT_SECONDS))
+        if self.dropped_cnt > 0:
+            logger_exporter.warning("[{}] {} metrics records dropped".format(self.name, self.dropped_cnt))
+
+    def open(self):
+        pass
+
+    @abc.abstractmethod
+    def write_batch(self, records):
+        pass
+
+    def close_out(self):
+        pass
+
+
+##
+# Sink writing metrics records to a CSV file (title line derived from the first record)
+##
+class CsvSink(MetricsSink):
+    def __init__(self, file_name, rec_types=None):
+        MetricsSink.__init__(self, "csv:" + file_name, rec_types=rec_types)
+        self.file_name = file_name
+        self.file = None
+        self.print_title_line = True
+
+    def open(self):
+        self.file = open(self.file_name, 'w')
+
+    def write_batch(self, records):
+        for record in records:
+            if self.print_title_line:
+                self.file.write("time,{}\n".format(",".join(record.m_names)))
+                self.print_title_line = False
+
+            self.file.write("{},{}\n".format(str(record.ts), ",".join(map(str, record.m_values))))
+        self.file.flush()
+
+    def close_out(self):
+        if self.file is not None:
+            self.file.close()
+
+
+##
+# Sink writing metrics records in Graphite PlainText Protocol format, to a file and to a
+#   (Prometheus) Graphite exporter over TCP
+##
+class GraphiteSink(MetricsSink):
+    def __init__(self, file_name, address, prefix):
+        MetricsSink.__init__(self, "graphite:" + address)
+        self.file_name = file_name
+        self.address = address
+        self.prefix = prefix
+        self.file = None
+        self.sokt = None
+
+    def open(self):
+        # connect first, so that no (empty) metrics file is left behind if the exporter can't be reached
+        self.sokt = _connect_tcp(self.address)
+
+        self.file = open(self.file_name, 'w')
+
+    def write_batch(self, records):
+        graphite_metrics_strs = []
+        for record in records:
+            for metrics_name, metrics_value in zip(record.m_names, record.m_values):
+                graphite_metrics_strs.append("{}_{};clnt_type={} {} {}".format(
+                    self.prefix,
+                    _sanitize(metrics_name),
+                    record.client_type,
+                    metrics_value,
+                    record.ts
+                ))
+
+        self.file.write("".join(gm_str + "\n" for gm_str in graphite_metrics_strs))
+        self.file.flush()
+        self.sokt = _send_tcp_lines(self.sokt, self.address, graphite_metrics_strs, "\r\n")
+
+    def close_out(self):
+        if self.sokt is not None:
+            self.sokt.close()
+        if self.file is not None:
+            self.file.close()
+
+
+##
+# Sink writing metrics records in InfluxDB line protocol format, over UDP or TCP or to a file.
+#   The measurement name is suffixed with the record type for non-interval records (e.g. "ppfb_drain").
+##
+class InfluxDbSink(MetricsSink):
+    def __init__(self, protocol, address, measurement, batch_size, flush_interval):
+        MetricsSink.__init__(self, "influxdb-{}:{}".format(protocol, address), batch_size, flush_interval)
+        self.protocol = protocol
+        self.address = address
+        self.measurement = measurement
+        self.file = None
+        self.sokt = None
+
+    def open(self):
+        if self.protocol == "file":
+            self.file = open(self.address, 'w')
+        elif self.protocol == "tcp":
+            self.sokt = _connect_tcp(self.address)
+        else:
+            self.sokt = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sokt.settimeout(_EXPORTER_SOCKET_TIMEOUT_SECONDS)
+
+    def write_batch(self, records):
+        influx_lines = []
+        for record in records:
+            measurement = self.measurement
+            if record.rec_type != _INTERVAL_RECORD_TYPE:
+                measurement = "{}_{}".format(self.measurement, record.rec_type)
+
+            influx_lines.append("{},clnt_type={} {} {}".format(
+                measurement,
+                record.client_type,
+                ",".join("{}={}".format(_sanitize(metrics_name), metrics_value)
+                         for metrics_name, metrics_value in zip(record.m_names, record.m_values)),
+                # line protocol timestamps are in nanoseconds
+                record.ts * 1000000000
+            ))
+
+        if self.protocol == "file":
+            self.file.write("".join(influx_line + "\n" for influx_line in influx_lines))
+            self.file.flush()
+        elif self.protocol == "tcp":
+            self.sokt = _send_tcp_lines(self.sokt, self.address, influx_lines, "\n")
+        else:
+            _send_udp_lines(self.sokt, self.address, influx_lines)
+
+    def close_out(self):
+        if self.sokt is not None:
+            self.sokt.close()
+        if self.file is not None:
+            self.file.close()
+
+
+##
+# Sink sending metrics records as StatsD gauges over UDP
+#   ("<prefix>.<clnt_type>.<metrics_name>:<value>|g"; StatsD has no timestamps)
+##
+class StatsdSink(MetricsSink):
+    def __init__(self, address, prefix, batch_size, flush_interval):
+        MetricsSink.__init__(self, "statsd:" + address, batch_size, flush_interval)
+        self.address = address
+        self.prefix = prefix
+        self.sokt = None
+
+    def open(self):
+        self.sokt = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sokt.settimeout(_EXPORTER_SOCKET_TIMEOUT_SECONDS)
+
+    def write_batch(self, records):
+        statsd_lines = []
+        for record in records:
+            for metrics_name, metrics_value in zip(record.m_names, record.m_values):
+                statsd_lines.append("{}.{}.{}:{}|g".format(
+                    self.prefix,
+                    record.client_type,
+                    _sanitize(metrics_name),
+                    metrics_value
+                ))
+
+        _send_udp_lines(self.sokt, self.address, statsd_lines)
+
+    def close_out(self):
+        if self.sokt is not None:
+            self.sokt.close()
+
+
+##
+# Fan out each metrics record to all the configured metrics sinks
+##
+class MetricsSinkPipeline:
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    def start(self):
+        for sink in self.sinks:
+            sink.start()
+
+    def submit(self, record):
+        for sink in self.sinks:
+            if sink.accepts(record):
+                sink.submit(record)
+
+    def close(self):
+        # let all the sinks flush in parallel before waiting for each of them
+        for sink in self.sinks:
+            sink.request_stop()
+        for sink in self.sinks:
+            sink.stop()
+
+
+##
+# Connect to a metrics exporter (format: <host>:<port>) over TCP
+##
+def _connect_tcp(address):
+    host, port_str = address.split(':')
+    return socket.create_connection((host, int(port_str)), _EXPORTER_SOCKET_TIMEOUT_SECONDS)
+
+
+##
+# Send metrics lines over TCP and return the socket to use for the next batch. After a failure, a
+#   partial line may have been sent, so the connection is closed (and the error raised) and a new
+#   connection is made for the next batch.
+##
+def _send_tcp_lines(sokt, address, lines, line_sep):
+    # not connected yet or closed after a failure
+    if sokt is None or sokt.fileno() == -1:
+        sokt = _connect_tcp(address)
+
+    try:
+        sokt.sendall("".join(line + line_sep for line in lines).encode('ascii'))
+    except OSError:
+        sokt.close()
+        raise
+
+    return sokt
+
+
+##
+# Send newline separated metrics lines over UDP, packing as many lines as possible per datagram
+##
+def _send_udp_lines(sokt, address, lines):
+    host, port_str = address.split(':')
+    target = (host, int(port_str))
+
+    packet = ""
+    for line in lines:
+        if packet and len(packet) + len(line) + 1 > _UDP_MAX_PACKET_SIZE:
+            sokt.sendto(packet.encode('ascii'), target)
+            packet = ""
+        packet = packet + line + "\n"
+
+    if packet:
+        sokt.sendto(packet.encode('ascii'), target)
+
+
 ##
 # pulsar-perf produce metrics line handler
 ##
 class MetricsLineHandler:
-    def __init__(self, sokt, rm_file, gm_file, prefix, clnt_type, m_names, line, mline_tag):
-        self.sokt = sokt
-        self.rm_file = rm_file
-        self.gm_file = gm_file
-        self.prefix = prefix
+    def __init__(self, pipeline, clnt_type, m_names, line, mline_tag, target_rate=None):
+        self.pipeline = pipeline
         self.client_type = clnt_type
         self.m_names = m_names
         self.line = line
         self.mline_tag = mline_tag
+        self.target_rate = target_rate
 
     def process(self):
         has_metrics = False
@@ -159,54 +633,68 @@ class MetricsLineHandler:
             thrupt_metrics_list = _parse_metrics_line(thrupt_str)
             latency_metrics_list = _parse_metrics_line(latency_str)
 
-            ##
-            # Write metrics to a CSV file
-            # - metrics value line
-            self.rm_file.write("{},{},{}\n".format(
-                str(metrics_ts),
-                ",".join(map(str, thrupt_metrics_list)),
-                ",".join(map(str, latency_metrics_list))))
+            # With a load schedule, the target rate goes right before the achieved throughput
+            if self.target_rate is not None:
+                thrupt_metrics_list = [str(self.target_rate)] + thrupt_metrics_list
 
             ##
-            # Write metrics to a Graphite exporter
-            if self.sokt is not None:
-                metrics_value_list = _combine_list(thrupt_metrics_list, latency_metrics_list)
-                gmetrics_cnt_per_line = len(metrics_value_list)
-
-                i = 0
-                while i < gmetrics_cnt_per_line:
-                    metrics_name = self.m_names[i]
-                    metrics_value = metrics_value_list[i]
-                    graphite_metrics_str = "{}_{};clnt_type={} {} {}".format(
-                        self.prefix,
-                        _sanitize(metrics_name),
-                        self.client_type,
-                        metrics_value,
-                        metrics_ts
-                    )
-
-                    self.gm_file.write(graphite_metrics_str + "\n")
-                    self.sokt.send("{}\r\n".format(graphite_metrics_str).encode('ascii'))
-
-                    i = i + 1
+            # Hand the metrics over to the sinks (CSV file, Graphite exporter, ...)
+            self.pipeline.submit(MetricsRecord(_INTERVAL_RECORD_TYPE,
+                                               metrics_ts,
+                                               self.client_type,
+                                               self.m_names,
+                                               _combine_list(thrupt_metrics_list, latency_metrics_list)))
 
         return has_metrics
 
 
+##
+# Terminate a command started in its own process group (shell and all its children)
+##
+def _terminate_process_group(p):
+    try:
+        os.killpg(p.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+##
+# Start a (daemon) timer that terminates a command's process group when it expires
+##
+def _start_terminate_timer(p, timeout_seconds):
+    timer = threading.Timer(timeout_seconds, _terminate_process_group, [p])
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
 ##
 # Execute "pulsar-perf produce command
 ##
-def _exec_pulsar_perf_cmd(pperf_cmd_timeout, cmdstr, subcmd, rm_file, gm_file, graphite_port, gmetrics_prefix):
+def _exec_pulsar_perf_cmd(pperf_cmd_timeout, cmdstr, subcmd, pipeline, target_rate=None, cmd_deadline=None,
+                          clients_ready_cb=None):
     cmd_start_time = datetime.now()
 
+    # Run in its own process group so that the pulsar-perf JVM (not only the shell) can be stopped.
+    #   Since it then no longer gets the terminal's Ctrl-C, it is always terminated on the way out.
     p = subprocess.Popen(
         [cmdstr],
         shell=True,
         text=True,
         stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT
+        stderr=subprocess.STDOUT,
+        start_new_session=True
     )
 
+    # Stop the command exactly at the deadline (e.g. the end of a load schedule step), instead of
+    #   waiting for the next output line. The deadline only starts counting once the pulsar-perf
+    #   clients are created (or the first interval line shows up), so the JVM and client startup
+    #   doesn't eat into the load window; until then, a startup grace period applies on top of it.
+    deadline_timer = None
+    clients_ready = False
+    if cmd_deadline is not None:
+        deadline_timer = _start_terminate_timer(p, cmd_deadline + _PPERF_STARTUP_GRACE_SECONDS)
+
     metrics_names = []
     if subcmd == "produce":
         metrics_names = _combine_list(_PRODUCER_THRUPT_METRICS_NAMES, _LATENCY_METRICS_NAMES)
@@ -215,63 +703,55 @@ def _exec_pulsar_perf_cmd(pperf_cmd_timeout, cmdstr, subcmd, rm_file, gm_file, g
 
     assert (len(metrics_names) > 0)
 
-    ##
-    # Open a socket to remote graphite reporter
-    sokt = None
-    if graphite_port != "":
-        sokt = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        host, port_str = graphite_port.split(':')
-        port = int(port_str)
-        sokt.connect((host, port))
-
-    print_title_line = True
-    while True:
-        line = p.stdout.readline()
+    if target_rate is not None:
+        metrics_names = _combine_list([_TARGET_RATE_METRICS_NAME], metrics_names)
 
-        # This only works for producer and doesn't work for consumer
-        #   because consumer doesn't honor "--test-duration" parameter
-        if not line:
-            break
+    if subcmd == "produce":
+        metrics_line_identifier = "Throughput produced:"
+    else:
+        metrics_line_identifier = "Throughput received:"
 
-        cur_time = datetime.now()
-        cmd_exec_time = cur_time - cmd_start_time
-        if cmd_exec_time.total_seconds() > (pperf_cmd_timeout + 10):
-            break
+    try:
+        while True:
+            line = p.stdout.readline()
 
-        if not line.strip() == "":
-            logger_pulsar_perf.debug(line.strip())
+            # This only works for producer and doesn't work for consumer
+            #   because consumer doesn't honor "--test-duration" parameter
+            if not line:
+                break
 
-        if subcmd == "produce":
-            title_line = "time,{},{}\n".format(
-                ",".join(_PRODUCER_THRUPT_METRICS_NAMES),
-                ",".join(_LATENCY_METRICS_NAMES))
-            metrics_line_identifier = "Throughput produced:"
-        else:
-            title_line = "time,{},{}\n".format(
-                ",".join(_PRODUCER_THRUPT_METRICS_NAMES),
-                ",".join(_LATENCY_METRICS_NAMES))
-            metrics_line_identifier = "Throughput received:"
-
-        metrics_line_handler = MetricsLineHandler(sokt,
-                                                  rm_file,
-                                                  gm_file,
-                                                  gmetrics_prefix,
-                                                  subcmd,
-                                                  metrics_names,
-                                                  line,
-                                                  metrics_line_identifier)
-
-        # - header line
-        if print_title_line:
-            rm_file.write(title_line)
-            print_title_line = False
-
-        line_processed = metrics_line_handler.process()
-
-    p.terminate()
-
-    if sokt is not None:
-        sokt.close()
+            cur_time = datetime.now()
+            cmd_exec_time = cur_time - cmd_start_time
+            if pperf_cmd_timeout is not None and cmd_exec_time.total_seconds() > (pperf_cmd_timeout + 10):
+                break
+
+            if not line.strip() == "":
+                logger_pulsar_perf.debug(line.strip())
+
+            if not clients_ready and (_PPERF_CLIENTS_READY.search(line) or metrics_line_identifier in line):
+                clients_ready = True
+
+                if deadline_timer is not None:
+                    deadline_timer.cancel()
+                    deadline_timer = _start_terminate_timer(p, cmd_deadline)
+
+                if clients_ready_cb is not None:
+                    clients_ready_cb(cur_time)
+
+            metrics_line_handler = MetricsLineHandler(pipeline,
+                                                      subcmd,
+                                                      metrics_names,
+                                                      line,
+                                                      metrics_line_identifier,
+                                                      target_rate)
+
+            line_processed = metrics_line_handler.process()
+    finally:
+        if deadline_timer is not None:
+            deadline_timer.cancel()
+
+        _terminate_process_group(p)
+        p.wait()
 
 
 ##
@@ -325,6 +805,139 @@ def _exec_pulsar_adm_cmd(cmdstr, show_cmd_output=True, keyword_to_chk=None):
     return http_cd, http_rsnstr, keyword_exists
 
 
+##
+# Execute "pulsar-admin" command whose output is a JSON document (e.g. topic stats)
+##
+def _exec_pulsar_adm_cmd_json(cmdstr):
+    logger_pulsar_admin.debug("      ({})".format(cmdstr))
+
+    p = subprocess.Popen(
+        [cmdstr],
+        shell=True,
+        text=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT
+    )
+    cmd_output, _ = p.communicate()
+
+    warn_msg_to_skip = "Warning: Nashorn engine"
+    json_lines = [line for line in cmd_output.splitlines() if warn_msg_to_skip not in line]
+    json_str = "\n".join(json_lines)
+
+    # skip any non-JSON preamble before the document itself
+    json_start_pos = json_str.find("{")
+    if json_start_pos == -1:
+        logger_pulsar_admin.debug(json_str.strip())
+        return None
+
+    try:
+        return json.loads(json_str[json_start_pos:])
+    except ValueError:
+        logger_pulsar_admin.debug(json_str.strip())
+        return None
+
+
+##
+# Get the message backlog (count and bytes) of a subscription through "pulsar-admin topics [partitioned-]stats"
+##
+def _get_subscription_backlog(adm_bin, topic_name, partitioned_topic, subscription_name):
+    stats_subcmd = "partitioned-stats" if partitioned_topic else "stats"
+    pulsar_admin_cmd_str = "{} topics {} {}".format(adm_bin, stats_subcmd, topic_name)
+    topic_stats = _exec_pulsar_adm_cmd_json(pulsar_admin_cmd_str)
+
+    if topic_stats is None:
+        return None, None
+
+    subscription_stats = topic_stats.get('subscriptions', {}).get(subscription_name)
+    if subscription_stats is None:
+        return None, None
+
+    return int(subscription_stats.get('msgBacklog', 0)), int(topic_stats.get('backlogSize', 0))
+
+
+##
+# Get the average message payload size (in bytes) of a "pulsar-perf produce" payload file
+##
+def _get_avg_payload_size(payload_file, payload_delimiter):
+    with open(payload_file, 'rb') as f:
+        payload_data = f.read()
+
+    payloads = [payload for payload in payload_data.split(payload_delimiter.encode()) if payload]
+    if not payloads:
+        return 0
+
+    return sum(len(payload) for payload in payloads) / len(payloads)
+
+
+##
+# Monitor the subscription backlog while the consumers drain it
+##
+class BacklogDrainMonitor(threading.Thread):
+    def __init__(self, adm_bin, topic_name, partitioned_topic, subscription_name, poll_interval, init_backlog):
+        threading.Thread.__init__(self, daemon=True)
+        self.adm_bin = adm_bin
+        self.topic_name = topic_name
+        self.partitioned_topic = partitioned_topic
+        self.subscription_name = subscription_name
+        self.poll_interval = poll_interval
+        self.init_backlog = init_backlog
+        self.stop_event = threading.Event()
+
+        # The drain clock starts when pulsar-perf reports its consumers started (see "clients_ready()"),
+        #   so that the consumer (JVM) startup time is not counted as drain time. The backlog polls
+        #   are only used to detect the zero backlog.
+        self.start_time = None
+        self.last_backlog = init_backlog
+        self.last_poll_time = None
+        self.drained_time = None
+
+    def run(self):
+        while not self.stop_event.is_set():
+            msg_backlog, _ = _get_subscription_backlog(self.adm_bin,
+                                                       self.topic_name,
+                                                       self.partitioned_topic,
+                                                       self.subscription_name)
+            poll_time = datetime.now()
+
+            if msg_backlog is not None:
+                self.last_backlog = msg_backlog
+                self.last_poll_time = poll_time
+
+                if msg_backlog == 0:
+                    self.drained_time = poll_time
+                    break
+
+            self.stop_event.wait(self.poll_interval)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+    # Called with the time the consumers started; only the first call (i.e. load schedule step) counts
+    def clients_ready(self, ready_time):
+        if self.start_time is None:
+            self.start_time = ready_time
+
+    # Drain metrics values, in the same order as "_DRAIN_METRICS_NAMES"
+    def drain_metrics(self):
+        # drain time is either the time to reach zero backlog or, if the backlog is
+        # not fully drained, the time until the last successful backlog poll
+        drained = self.drained_time is not None
+        end_time = self.drained_time if drained else self.last_poll_time
+
+        drain_seconds = 0.0
+        if self.start_time is not None and end_time is not None:
+            drain_seconds = max(0.0, (end_time - self.start_time).total_seconds())
+        drained_msgs = self.init_backlog - self.last_backlog
+        drain_thrupt = drained_msgs / drain_seconds if drain_seconds > 0 else 0.0
+
+        return [self.init_backlog,
+                drained_msgs,
+                round(drain_seconds, 3),
+                round(drain_thrupt, 1),
+                1 if drained else 0]
+
+
 ##
 # Process the generated hgrm file from pulsar-perf
 ##
@@ -363,6 +976,7 @@ if __name__ == '__main__':
 
     logger_pulsar_admin = logging.getLogger('pulsar-admin')
     logger_pulsar_perf = logging.getLogger('pular-perf')
+    logger_exporter = logging.getLogger('exporter')
 
     ##
     # Process input parameters
@@ -392,19 +1006,8 @@ if __name__ == '__main__':
     # parameter "-d/--duration"
     duration_in_sec = 600
     if arg_ns.duration is not None:
-        arg_duration_str = arg_ns.duration
-        time_unit = arg_duration_str[-1]
-
         try:
-            arg_duration_intval = int(arg_duration_str[0:len(arg_duration_str) - 1])
-            if time_unit == 's':
-                duration_in_sec = arg_duration_intval
-            elif time_unit == 'm':
-                duration_in_sec = arg_duration_intval * 60
-            elif time_unit == 'h':
-                duration_in_sec = arg_duration_intval * 3600
-            else:
-                duration_in_sec = int("wrong_format")
+            duration_in_sec = _parse_duration_str(arg_ns.duration)
         except ValueError as verr:
             _error_exit(
                 20, "Invalid duration (\"-d/--duration\") value format. Valid format: \"<integer_value>[h|m|s]\"", True)
@@ -442,6 +1045,9 @@ if __name__ == '__main__':
     config_category = ['pfb-connection',
                        'pfb-general',
                        'pfb-persistence',
+                       'pfb-backlog-seed',
+                       'pfb-schedule',
+                       'pfb-exporters',
                        'pulsar-perf-common',
                        'pulsar-perf-producer',
                        'pulsar-perf-consumer']
@@ -514,6 +1120,114 @@ if __name__ == '__main__':
                             ensemble_size, write_quorum, ack_quorum),
                         False)
 
+    ###
+    # Check backlog seeding settings if needed (only applicable to "consumer" client type)
+    pfb_backlog_seed_settings = config_data.get('pfb-backlog-seed') or {}
+    backlog_seed_enabled = bool(pfb_backlog_seed_settings.get('enabled')) and client_type == "consumer"
+    seed_target_msgs = 0
+    seed_target_bytes = 0
+    seed_confirm_timeout = 300
+    seed_poll_interval = 1
+    seed_producer_settings = {}
+    if backlog_seed_enabled:
+        # Non-persistent topics never retain messages, so there is no backlog to drain
+        if topic_pers_str != "persistent":
+            _error_exit(240, "Backlog seeding requires a \"persistent\" topic (\"topic_type\").", False)
+
+        try:
+            seed_target_msgs = int(pfb_backlog_seed_settings.get('target_messages') or 0)
+            seed_target_bytes = int(pfb_backlog_seed_settings.get('target_bytes') or 0)
+            seed_confirm_timeout = int(pfb_backlog_seed_settings.get('confirm_timeout_seconds') or 300)
+            seed_poll_interval = int(pfb_backlog_seed_settings.get('poll_interval_seconds') or 1)
+        except ValueError as verr:
+            _error_exit(120, "Incorrect \"pfb-backlog-seed\" settings. "
+                             "\"target_messages\", \"target_bytes\", \"confirm_timeout_seconds\" and "
+                             "\"poll_interval_seconds\" must be integers.", False)
+
+        if seed_target_msgs <= 0 and seed_target_bytes <= 0:
+            _error_exit(130, "Either \"target_messages\" or \"target_bytes\" must be set when backlog seeding "
+                             "is enabled.", False)
+
+        seed_producer_settings = dict(pfb_backlog_seed_settings.get('pulsar-perf-seed-producer') or {})
+
+        # Convert the target backlog size (bytes) to a message count based on the seeding payload
+        if seed_target_msgs <= 0:
+            seed_payload_file = seed_producer_settings.get('payload-file')
+            if seed_payload_file:
+                if not path.exists(seed_payload_file):
+                    _error_exit(140, "Can't find backlog seeding payload file: \"{}\".".format(seed_payload_file),
+                                False)
+                seed_payload_delimiter = seed_producer_settings.get('payload-delimiter') or "\n"
+                seed_msg_size = _get_avg_payload_size(seed_payload_file, seed_payload_delimiter)
+            else:
+                seed_msg_size = int(seed_producer_settings.get('msg-size') or 1024)
+
+            if seed_msg_size <= 0:
+                _error_exit(150, "Can't determine backlog seeding message size.", False)
+
+            seed_target_msgs = math.ceil(seed_target_bytes / seed_msg_size)
+
+    ###
+    # Check load schedule settings if needed. The schedule determines the total duration.
+    pfb_schedule_settings = config_data.get('pfb-schedule') or {}
+    schedule_enabled = bool(pfb_schedule_settings.get('enabled'))
+    schedule_steps = []
+    if schedule_enabled:
+        try:
+            schedule_steps = _expand_load_schedule(pfb_schedule_settings.get('segments') or [])
+        except (KeyError, IndexError, TypeError, ValueError) as ex:
+            _error_exit(180, "Incorrect \"pfb-schedule\" settings ({}).".format(repr(ex)), False)
+
+        if not schedule_steps:
+            _error_exit(190, "At least one \"segments\" item is needed when load schedule is enabled.", False)
+
+        duration_in_sec = sum(step_duration for _, step_duration in schedule_steps)
+
+    ###
+    # Check metrics exporter settings if needed (CSV files and "-g/--prom_graphite" are always available)
+    pfb_exporters_settings = config_data.get('pfb-exporters') or {}
+
+    influxdb_settings = pfb_exporters_settings.get('influxdb') or {}
+    influxdb_enabled = bool(influxdb_settings.get('enabled'))
+    influxdb_protocol = str(influxdb_settings.get('protocol') or "udp").lower()
+    influxdb_address = influxdb_settings.get('address') or ""
+    influxdb_measurement = influxdb_settings.get('measurement') or "ppfb"
+    if influxdb_enabled:
+        valid_influxdb_protocols = ['udp', 'tcp', 'file']
+        if influxdb_protocol not in valid_influxdb_protocols:
+            _error_exit(200, "Incorrect setting of InfluxDB exporter \"protocol\". Valid values: {}".format(
+                valid_influxdb_protocols), False)
+        if influxdb_protocol != "file" and not _chk_exporter_address(influxdb_address):
+            _error_exit(210, "Invalid InfluxDB exporter \"address\" format. Valid format: \"<host>:<port>\"", False)
+
+    statsd_settings = pfb_exporters_settings.get('statsd') or {}
+    statsd_enabled = bool(statsd_settings.get('enabled'))
+    statsd_address = statsd_settings.get('address') or ""
+    statsd_prefix = statsd_settings.get('prefix') or "ppfb"
+    if statsd_enabled and not _chk_exporter_address(statsd_address):
+        _error_exit(220, "Invalid StatsD exporter \"address\" format. Valid format: \"<host>:<port>\"", False)
+
+    try:
+        influxdb_batch_size = int(influxdb_settings.get('batch_size') or 100)
+        influxdb_flush_interval = float(influxdb_settings.get('flush_interval_seconds') or 1)
+        statsd_batch_size = int(statsd_settings.get('batch_size') or 100)
+        statsd_flush_interval = float(statsd_settings.get('flush_interval_seconds') or 1)
+    except ValueError as verr:
+        _error_exit(230, "Incorrect \"pfb-exporters\" settings. \"batch_size\" and \"flush_interval_seconds\" "
+                         "must be numbers.", False)
+
+    # a batch must be flushed well within the time given to the sinks to finish at exit
+    batch_settings = []
+    if influxdb_enabled:
+        batch_settings.append((influxdb_batch_size, influxdb_flush_interval))
+    if statsd_enabled:
+        batch_settings.append((statsd_batch_size, statsd_flush_interval))
+    for batch_size, flush_interval in batch_settings:
+        if batch_size <= 0 or not (0 < flush_interval < _EXPORTER_STOP_TIMEOUT_SECONDS):
+                _error_exit(230, "Incorrect \"pfb-exporters\" settings. \"batch_size\" must be positive and "
+                             "\"flush_interval_seconds\" must be positive and less than {}.".format(
+                                 _EXPORTER_STOP_TIMEOUT_SECONDS), False)
+
     ###
     # Start submitting the workload to the Pulsar instance
     #
@@ -643,68 +1357,257 @@ if __name__ == '__main__':
     # if not stats_interval_keystr in _combined_settings:
     #     _combined_settings[stats_interval_keystr] = 10
 
-    pperfCmdOptionStr = _gen_pulsar_perf_cmdopt_str(_combined_settings)
-    if duration_in_sec > 0:
-        pperfCmdOptionStr = "--test-duration {}".format(duration_in_sec) + " " + pperfCmdOptionStr
-
-    pulsar_perf_cmd_str = "{} {} {} {}".format(
-        pulsar_perf_bin,
-        pperf_subcmd,
-        pperfCmdOptionStr,
-        real_topic_name
-    )
-
     # pperf benchmark execution name
     pperf_exec_name = "pperf_bench_" + pperf_subcmd + "_" + _get_dttm_str_utc(_DTTM_FMT2)
+    # graphite_metrics_prefix = "pperf_bench_" + pperf_subcmd
+    graphite_metrics_prefix = "ppfb"
+
+    ###
+    # Seed the topic with a backlog for the consumers to drain, if requested
+    seed_subscription_name = ""
+    seed_init_backlog = 0
+    if backlog_seed_enabled:
+        # "pulsar-perf consume" only uses the subscriber name prefix as-is with a single subscription
+        if int(_combined_settings.get('num-subscriptions') or 1) > 1:
+            _error_exit(160, "Backlog seeding doesn't support more than 1 subscription (\"num-subscriptions\").",
+                        False)
+
+        seed_subscription_name = _combined_settings.get('subscriber-name') or "sub"
+        _combined_settings['subscriber-name'] = seed_subscription_name
+        _combined_settings['subscription-position'] = "Earliest"
+
+        # The subscription must exist before seeding so that the seeded messages are retained as its backlog
+        logger.info("{}. Create subscription \"{}\" on topic: {}".format(
+            cmd_output_cnt, seed_subscription_name, real_topic_name))
+
+        pulsar_admin_subcmd_str = "topics create-subscription -s {} -m earliest {}".format(
+            seed_subscription_name, real_topic_name)
+        pulsar_admin_cmd_str = "{} {}".format(pulsar_admin_bin, pulsar_admin_subcmd_str)
+        http_code, reason_str, _ = _exec_pulsar_adm_cmd(pulsar_admin_cmd_str)
+
+        # Without the subscription, the seeded messages are not retained; an existing one (409) is fine
+        if http_code == 409:
+            logger.info("   >> Subscription \"{}\" already exists".format(seed_subscription_name))
+        elif http_code >= 300:
+            _error_exit(250, "Failed to create subscription \"{}\" on topic {} (HTTP {}). {}".format(
+                seed_subscription_name, real_topic_name, http_code, reason_str).rstrip(), False)
+
+        logger.info(_PULSAR_CMD_OUTPUT_SEPERATOR + "\n")
+        cmd_output_cnt = cmd_output_cnt + 1
+
+        # Produce the backlog as fast as the configured seeding producer allows
+        #   (the common "rate" is meant for the consumers and must not throttle the seeding)
+        seed_combined_settings = dict(pperf_common_settings)
+        seed_combined_settings.pop('rate', None)
+        seed_combined_settings.update(seed_producer_settings)
+        if not seed_combined_settings.get('rate'):
+            seed_combined_settings['rate'] = _SEED_DEFAULT_RATE
+        seed_combined_settings['num-messages'] = seed_target_msgs
+
+        seedCmdOptionStr = _gen_pulsar_perf_cmdopt_str(seed_combined_settings)
+        seed_cmd_str = "{} produce {} {}".format(pulsar_perf_bin, seedCmdOptionStr, real_topic_name)
+
+        seed_exec_name = pperf_exec_name + "_seed"
+        seed_raw_metrics_file_name = "metrics/" + seed_exec_name + "_metrics.raw.csv"
+
+        logger.info("{}. Seed backlog of {} messages: \"pulsar-perf produce {} {}\"".format(
+            cmd_output_cnt, seed_target_msgs, seedCmdOptionStr, real_topic_name))
+        logger.info("        seed raw metrics file: {}".format(seed_raw_metrics_file_name))
+
+        seed_start_time = datetime.now()
+        seed_metrics_pipeline = MetricsSinkPipeline([CsvSink(seed_raw_metrics_file_name)])
+        seed_metrics_pipeline.start()
+        try:
+            # No timeout: seeding is bounded by "--num-messages"
+            _exec_pulsar_perf_cmd(
+                None,
+                seed_cmd_str,
+                "produce",
+                seed_metrics_pipeline
+            )
+        finally:
+            seed_metrics_pipeline.close()
+        _process_hgrm_result_file(pulsar_bin_homedir, seed_exec_name)
+
+        seed_time_diff = datetime.now() - seed_start_time
+        logger.info("   >> Backlog seeding time: {} seconds".format(seed_time_diff.total_seconds()))
+        logger.info(_PULSAR_CMD_OUTPUT_SEPERATOR + "\n")
+        cmd_output_cnt = cmd_output_cnt + 1
+
+        # Confirm the backlog through the admin path before starting the consumers
+        logger.info("{}. Confirm backlog of subscription \"{}\" (target: {} messages)".format(
+            cmd_output_cnt, seed_subscription_name, seed_target_msgs))
+
+        confirm_start_time = datetime.now()
+        msg_backlog, backlog_bytes = None, None
+        while True:
+            msg_backlog, backlog_bytes = _get_subscription_backlog(pulsar_admin_bin,
+                                                                   real_topic_name,
+                                                                   partitioned and _num_partitions > 1,
+                                                                   seed_subscription_name)
+            if msg_backlog is not None and msg_backlog >= seed_target_msgs:
+                break
+
+            confirm_time_diff = datetime.now() - confirm_start_time
+            if confirm_time_diff.total_seconds() > seed_confirm_timeout:
+                _error_exit(170, "Backlog of subscription \"{}\" didn't reach {} messages within {} seconds "
+                                 "(current backlog: {}).".format(seed_subscription_name,
+                                                                 seed_target_msgs,
+                                                                 seed_confirm_timeout,
+                                                                 msg_backlog),
+                            False)
+
+            time.sleep(seed_poll_interval)
+
+        seed_init_backlog = msg_backlog
+        logger.info("   >> Confirmed backlog: {} messages, {} bytes".format(msg_backlog, backlog_bytes))
+        logger.info(_PULSAR_CMD_OUTPUT_SEPERATOR + "\n")
+        cmd_output_cnt = cmd_output_cnt + 1
+
+    # Without a load schedule, the whole run is one step with the configured rate
+    if schedule_enabled:
+        pperf_steps = schedule_steps
+    else:
+        pperf_steps = [(None, duration_in_sec)]
+
+    pperfCmdOptionStrs = []
+    for step_rate, step_duration in pperf_steps:
+        step_settings = dict(_combined_settings)
+        if step_rate is not None:
+            step_settings['rate'] = step_rate
+
+        pperfCmdOptionStr = _gen_pulsar_perf_cmdopt_str(step_settings)
+        if step_duration > 0:
+            pperfCmdOptionStr = "--test-duration {}".format(step_duration) + " " + pperfCmdOptionStr
+        pperfCmdOptionStrs.append(pperfCmdOptionStr)
+
     # CSV file for raw metrics output from "pulsar-perf"
     raw_metrics_file_name = "metrics/" + pperf_exec_name + "_metrics.raw.csv"
     # CSV file for "graphite-nized" metrics (in Graphite PlanText Protocol format)
     graphite_metrics_file_name = "metrics/" + pperf_exec_name + "_metrics.graphite.csv"
+    # CSV file for backlog drain metrics (only with backlog seeding)
+    drain_metrics_file_name = "metrics/" + pperf_exec_name + "_metrics.drain.csv"
+    # InfluxDB line protocol file (only with "file" InfluxDB exporter protocol)
+    if influxdb_enabled and influxdb_protocol == "file":
+        influxdb_address = "metrics/" + pperf_exec_name + "_metrics.influx.txt"
 
-    raw_metrics_file = None
-    graphite_metrics_file = None
+    metrics_pipeline = None
 
     try:
-        logger.info("{}. Run Pulsar Perf benchmark: \"pulsar-perf {} {} {}\"".format(
-            cmd_output_cnt, pperf_subcmd, pperfCmdOptionStr, real_topic_name))
+        if schedule_enabled:
+            logger.info("{}. Run Pulsar Perf benchmark with load schedule: {} steps, {} seconds in total".format(
+                cmd_output_cnt, len(pperf_steps), duration_in_sec))
+            for step_idx, (step_rate, step_duration) in enumerate(pperf_steps):
+                logger.info("   >> step {}: {} msg/s for {} seconds".format(step_idx + 1, step_rate, step_duration))
+        else:
+            logger.info("{}. Run Pulsar Perf benchmark: \"pulsar-perf {} {} {}\"".format(
+                cmd_output_cnt, pperf_subcmd, pperfCmdOptionStrs[0], real_topic_name))
         cmd_output_cnt = cmd_output_cnt + 1
 
         logger.info("                     log file: {}".format(log_file_name))
         logger.info("             raw metrics file: {}".format(raw_metrics_file_name))
-        logger.info("        graphite metrics file: {}".format(graphite_metrics_file_name))
+        if backlog_seed_enabled:
+            logger.info("           drain metrics file: {}".format(drain_metrics_file_name))
         if prom_graphite_port is not None and prom_graphite_port != "":
+            logger.info("        graphite metrics file: {}".format(graphite_metrics_file_name))
             logger.info("     graphite exporter port: {}".format(prom_graphite_port))
+        if influxdb_enabled:
+            logger.info("            influxdb exporter: {}://{}".format(influxdb_protocol, influxdb_address))
+        if statsd_enabled:
+            logger.info("              statsd exporter: udp://{}".format(statsd_address))
         logger.info(_PULSAR_CMD_OUTPUT_SEPERATOR)
         print("   Pulsar-perf execution is in progress. Please check the output log file for more details ...\n")
 
         start_time = datetime.now()
 
-        raw_metrics_file = open(raw_metrics_file_name, 'w')
-        graphite_metrics_file = open(graphite_metrics_file_name, 'w')
-        # graphite_metrics_prefix = "pperf_bench_" + pperf_subcmd
-        graphite_metrics_prefix = "ppfb"
-
-        # Execute "pulsar-perf" command
+        # Every parsed metrics record is fanned out to all the configured sinks
+        metrics_sinks = [CsvSink(raw_metrics_file_name, [_INTERVAL_RECORD_TYPE])]
+        if backlog_seed_enabled:
+            metrics_sinks.append(CsvSink(drain_metrics_file_name, [_DRAIN_RECORD_TYPE]))
+        if prom_graphite_port != "":
+            metrics_sinks.append(GraphiteSink(graphite_metrics_file_name,
+                                              prom_graphite_port,
+                                              graphite_metrics_prefix))
+        if influxdb_enabled:
+            metrics_sinks.append(InfluxDbSink(influxdb_protocol,
+                                              influxdb_address,
+                                              influxdb_measurement,
+                                              influxdb_batch_size,
+                                              influxdb_flush_interval))
+        if statsd_enabled:
+            metrics_sinks.append(StatsdSink(statsd_address,
+                                            statsd_prefix,
+                                            statsd_batch_size,
+                                            statsd_flush_interval))
+
+        metrics_pipeline = MetricsSinkPipeline(metrics_sinks)
+        metrics_pipeline.start()
+
+        # Track the backlog drain progress while the consumers are running
+        drain_monitor = None
+        if backlog_seed_enabled:
+            drain_monitor = BacklogDrainMonitor(pulsar_admin_bin,
+                                                real_topic_name,
+                                                partitioned and _num_partitions > 1,
+                                                seed_subscription_name,
+                                                seed_poll_interval,
+                                                seed_init_backlog)
+            drain_monitor.start()
+
+        # Execute "pulsar-perf" command, one instance per load schedule step. All steps write to
+        #   the same metrics files so that they form one continuous time series.
         #   NOTE: "pulsar-perf consume" doesn't respect "--test-duration" parameter
-        _exec_pulsar_perf_cmd(
-            duration_in_sec,
-            pulsar_perf_cmd_str,
-            pperf_subcmd,
-            raw_metrics_file,
-            graphite_metrics_file,
-            prom_graphite_port,
-            graphite_metrics_prefix
-        )
-
-        _process_hgrm_result_file(pulsar_bin_homedir, pperf_exec_name)
+        for step_idx, (step_rate, step_duration) in enumerate(pperf_steps):
+            pulsar_perf_cmd_str = "{} {} {} {}".format(
+                pulsar_perf_bin,
+                pperf_subcmd,
+                pperfCmdOptionStrs[step_idx],
+                real_topic_name
+            )
+
+            if schedule_enabled:
+                logger.debug("Start load schedule step {}: \"pulsar-perf {} {} {}\"".format(
+                    step_idx + 1, pperf_subcmd, pperfCmdOptionStrs[step_idx], real_topic_name))
+
+            # Scheduled steps are bounded by their deadline, not by the output line based timeout
+            _exec_pulsar_perf_cmd(
+                None if schedule_enabled else step_duration,
+                pulsar_perf_cmd_str,
+                pperf_subcmd,
+                metrics_pipeline,
+                step_rate,
+                step_duration if schedule_enabled else None,
+                drain_monitor.clients_ready if drain_monitor is not None else None
+            )
+
+            if schedule_enabled:
+                _process_hgrm_result_file(pulsar_bin_homedir, "{}_step{}".format(pperf_exec_name, step_idx + 1))
+            else:
+                _process_hgrm_result_file(pulsar_bin_homedir, pperf_exec_name)
 
         end_time = datetime.now()
         time_diff = end_time - start_time
         logger.info("Pulsar-perf execution time: {} seconds".format(time_diff.total_seconds()))
 
-    finally:
-        if graphite_metrics_file is not None:
-            graphite_metrics_file.close()
+        if drain_monitor is not None:
+            drain_monitor.stop()
+            drain_metrics = drain_monitor.drain_metrics()
 
-        if raw_metrics_file is not None:
-            raw_metrics_file.close()
+            if drain_monitor.drained_time is not None:
+                logger.info("Time to zero backlog: {} seconds".format(drain_metrics[2]))
+            else:
+                logger.info("Backlog not fully drained (remaining: {} messages) after {} seconds".format(
+                    drain_monitor.last_backlog, drain_metrics[2]))
+            logger.info("Backlog drain throughput: {} msg/s ({} of {} messages)".format(
+                drain_metrics[3], drain_metrics[1], drain_metrics[0]))
+
+            metrics_pipeline.submit(MetricsRecord(_DRAIN_RECORD_TYPE,
+                                                  int(datetime.timestamp(datetime.now())),
+                                                  pperf_subcmd,
+                                                  _DRAIN_METRICS_NAMES,
+                                                  drain_metrics))
+
+    finally:
+        # Flush and close all the metrics sinks
+        if metrics_pipeline is not None:
+            metrics_pipeline.close()